@@ -12,16 +12,23 @@ Author: [Your Name]
 License: [License Type]
 """
 
+import importlib.util
+import os
 import matplotlib.cm as cm
 import pandas as pd
 import numpy as np
 from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import ListedColormap
+from matplotlib.patches import Polygon
 from scipy.spatial import ConvexHull
 
 # Configuration
 NUM_CLUSTERS = 6  # Number of deliberation groups to create
+ALIGN_TO_GAPS = False  # Place cluster boundaries on the largest angular gaps
+RANDOMIZED_PCA_MIN_CELLS = 1_000_000  # Use randomized SVD only for vote matrices at least this large
+USE_GPU = os.environ.get('KK24_USE_GPU') == '1'  # Run PCA with cuML if it is installed
 OUTPUT_FILENAME = 'radial_clustering_visualization.pdf'
 RANDOM_SEED = 42
 np.random.seed(RANDOM_SEED)
@@ -47,17 +54,18 @@ def load_and_preprocess_data(filepath):
         DataFrame with preprocessed data
     """
     print(f"Loading data from {filepath}...")
-    df = pd.read_csv(filepath)
+    # Use the multi-threaded PyArrow CSV parser when it is installed
+    engine = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+    df = pd.read_csv(filepath, engine=engine)
     
-    # Convert voting options to numeric values
-    # The CSV contains 'yes', 'no', or empty cells (abstain/skip)
-    for col in df.columns[1:]:  # Skip participant ID column
-        df[col] = df[col].map({'yes': 1, 'no': 0, np.nan: 0.5})
+    # Convert voting options to numeric values in one pass (skip participant ID column)
+    # The CSV contains 'yes', 'no', 'abstain', 'skip' or empty cells
+    votes = df.iloc[:, 1:].to_numpy(dtype=object)
+    numeric_votes = np.full(votes.shape, 0.5, dtype=np.float32)  # Treat everything else as abstain
+    numeric_votes[votes == 'yes'] = 1
+    numeric_votes[votes == 'no'] = 0
     
-    # Handle missing values
-    df.fillna(0.5, inplace=True)  # Treat missing votes as abstain
-    
-    return df
+    return pd.concat([df[['pid']], pd.DataFrame(numeric_votes, columns=df.columns[1:], index=df.index)], axis=1)
 
 def apply_pca(df):
     """
@@ -69,16 +77,39 @@ def apply_pca(df):
     Returns:
         DataFrame with PCA components and participant IDs
     """
-    # Extract participant IDs
-    participant_ids = df['pid'].copy()
+    # Extract participant IDs (the new DataFrame stores its own copy)
+    participant_ids = df['pid'].to_numpy()
     
-    # Standardize the data (only numeric columns, skip participant ID)
-    scaler = StandardScaler()
-    scaled_data = scaler.fit_transform(df.iloc[:, 1:])  # Exclude participant ID column
+    # Scale the data to unit variance in place (only numeric columns, skip participant ID);
+    # PCA centers internally, and centering commutes with per-column scaling
+    # float32 moves participant angles by only ~0.005 degrees against float64
+    votes = df.iloc[:, 1:].to_numpy(dtype=np.float32, copy=True)
+    vote_std = votes.std(axis=0)
+    vote_std[vote_std == 0] = 1  # Leave constant columns unscaled
+    votes /= vote_std
     
-    # Apply PCA
-    pca = PCA(n_components=2)
-    pca_components = pca.fit_transform(scaled_data)
+    # Apply PCA, on the GPU when requested and cuML is available
+    pca = None
+    if USE_GPU:
+        try:
+            import cupy as cp
+            from cuml.decomposition import PCA as cuPCA
+        except ImportError:
+            print("Warning: cuML not available, falling back to scikit-learn PCA")
+        else:
+            pca = cuPCA(n_components=2, svd_solver='jacobi', output_type='numpy')
+            pca_components = pca.fit_transform(cp.asarray(votes))
+    
+    if pca is None:
+        if votes.size >= RANDOMIZED_PCA_MIN_CELLS:
+            # Approximate the two components on large matrices; the extra power
+            # iterations keep participant angles close to the exact solution
+            pca = PCA(n_components=2, svd_solver='randomized', random_state=RANDOM_SEED,
+                      n_oversamples=10, iterated_power=20)
+        else:
+            # Exact SVD, so group assignments do not depend on the random seed
+            pca = PCA(n_components=2, svd_solver='full')
+        pca_components = pca.fit_transform(votes)
     
     # Create DataFrame with PCA results
     pca_df = pd.DataFrame(pca_components, columns=['PC1', 'PC2'])
@@ -93,13 +124,19 @@ def apply_pca(df):
     
     return pca_df
 
-def find_optimal_clustering(pca_df, num_clusters=6):
+def find_optimal_clustering(pca_df, num_clusters=6, align_to_gaps=False):
     """
     Find the optimal angular offset for radial clustering to create balanced groups.
     
+    Sorting participants by angle and cutting the circle into contiguous runs of
+    sizes k or k+1 is balanced for every offset, so no search is needed: by default
+    the unrotated order (offset 0) is used, the first offset a scan would accept.
+    
     Args:
         pca_df: DataFrame with PCA components
         num_clusters: Number of clusters to create
+        align_to_gaps: If True, rotate the slices so that cluster boundaries fall
+            on the largest angular gaps between participants
         
     Returns:
         DataFrame with cluster assignments, optimal angle offset
@@ -110,108 +147,119 @@ def find_optimal_clustering(pca_df, num_clusters=6):
     # Calculate how many clusters need extra participants for even distribution
     participants_per_cluster = total_participants // num_clusters
     clusters_with_extra = total_participants % num_clusters
+    cluster_sizes = np.full(num_clusters, participants_per_cluster)
+    cluster_sizes[:clusters_with_extra] += 1
     
     # Generate cluster labels (A-F)
     cluster_labels = list('ABCDEF')[:num_clusters]
     
-    # Try different angle offsets to find optimal grouping
-    for initial_angle_offset in range(0, 360, 1):
-        # Calculate central point and angles
-        central_point = [pca_df['PC1'].mean(), pca_df['PC2'].mean()]
-        angles = -np.arctan2(pca_df['PC2'] - central_point[1], pca_df['PC1'] - central_point[0])
-        angles_degrees = (np.degrees(angles) + initial_angle_offset + 360) % 360
-        
-        # Sort participants by angle
-        temp_df = pca_df.copy()
-        temp_df['Angle'] = angles_degrees
-        temp_df_sorted = temp_df.sort_values('Angle')
-        
-        # Distribute participants to clusters
-        assignments = []
-        current_label = 0
-        
-        # Assign participants_per_cluster to each group
-        for i in range(num_clusters):
-            if i < clusters_with_extra:
-                # These clusters get an extra participant
-                assignments += [cluster_labels[i]] * (participants_per_cluster + 1)
-            else:
-                assignments += [cluster_labels[i]] * participants_per_cluster
-        
-        # Ensure we don't exceed the number of participants
-        assignments = assignments[:total_participants]
+    # Calculate central point and angles
+    central_point = [pca_df['PC1'].mean(), pca_df['PC2'].mean()]
+    dx = pca_df['PC1'].to_numpy() - central_point[0]
+    dy = pca_df['PC2'].to_numpy() - central_point[1]
+    
+    # (degrees(-arctan2(dy, dx)) + 360) % 360, reusing the dx/dy buffers instead of
+    # allocating a temporary per step; arctan2 is odd in y, so negate dy up front
+    np.negative(dy, out=dy)
+    base_angles_degrees = np.arctan2(dy, dx, out=dx)
+    np.degrees(base_angles_degrees, out=base_angles_degrees)
+    base_angles_degrees += 360
+    base_angles_degrees %= 360
+    
+    initial_angle_offset = 0
+    cluster_ends = np.cumsum(cluster_sizes)
+    if align_to_gaps and total_participants > 1:
+        # Sort participants by angle once; an offset only rotates this cyclic order
+        sort_order = np.argsort(base_angles_degrees)
+        sorted_angles = base_angles_degrees[sort_order]
         
-        # Apply assignments to sorted DataFrame
-        temp_df_sorted['Cluster'] = assignments
+        # Angular gap following each sorted participant, wrapping past 360 degrees
+        gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 360))
         
-        # Map assignments back to original DataFrame
-        cluster_mapping = dict(zip(temp_df_sorted.index, temp_df_sorted['Cluster']))
-        temp_df['Cluster'] = temp_df.index.map(cluster_mapping)
+        # Gaps in front of each cluster's first participant, for every possible start
+        cluster_starts = cluster_ends - cluster_sizes
+        preceding = (np.arange(total_participants)[:, None] + cluster_starts - 1) % total_participants
+        start = int(np.argmax(gaps[preceding].sum(axis=1)))
         
-        # Check if we have balanced clusters (6-7 participants each)
-        cluster_sizes = temp_df.groupby('Cluster').size()
-        if cluster_sizes.min() >= participants_per_cluster and cluster_sizes.max() <= participants_per_cluster + 1:
-            print(f"Optimal arrangement found with angle offset: {initial_angle_offset}°")
-            print("Cluster sizes:", dict(cluster_sizes))
-            return temp_df, initial_angle_offset
-    
-    print("Warning: Could not find optimal arrangement")
-    return None, None
+        # Rotate so that the middle of the gap before the first participant maps to 0 degrees
+        gap_middle = sorted_angles[start - 1] + gaps[start - 1] / 2
+        initial_angle_offset = (360 - gap_middle) % 360
+        rotated_order = np.concatenate([sort_order[start:], sort_order[:start]])
+    elif num_clusters > 1:
+        # Without rotation only slice membership matters, not the order inside a
+        # slice, so partitioning at the slice boundaries replaces a full sort
+        slice_boundaries = np.minimum(cluster_ends[:-1], total_participants - 1)
+        rotated_order = np.argpartition(base_angles_degrees, slice_boundaries)
+    else:
+        rotated_order = np.arange(total_participants)
+    
+    # Assign contiguous runs of the rotated angular order to clusters
+    cluster_codes = np.empty(total_participants, dtype=np.int8)
+    cluster_codes[rotated_order] = np.repeat(np.arange(num_clusters, dtype=np.int8), cluster_sizes)
+    
+    result_df = pca_df.copy()
+    result_df['Angle'] = (base_angles_degrees + initial_angle_offset) % 360
+    result_df['Cluster'] = np.array(cluster_labels)[cluster_codes]
+    
+    counts = np.bincount(cluster_codes, minlength=num_clusters)
+    print(f"Optimal arrangement found with angle offset: {initial_angle_offset:g}°")
+    print("Cluster sizes:", dict(zip(cluster_labels, counts.tolist())))
+    return result_df, initial_angle_offset
 
-def visualize_clusters(df_with_clusters, central_point):
+def visualize_clusters(df_with_clusters, central_point, angle_offset=0):
     """
     Create visualization of the radial clustering results.
     
     Args:
         df_with_clusters: DataFrame with cluster assignments
         central_point: [x, y] coordinates of the central point
+        angle_offset: Angle offset (degrees) applied to the 'Angle' column
+        
+    Returns:
+        Dict mapping cluster labels to their ConvexHull (clusters with at least 3 points)
     """
     print("\nGenerating visualization...")
     fig, ax = plt.subplots(figsize=(10, 8))
     
-    # Add color information
-    df_with_clusters['Color'] = df_with_clusters['Cluster'].map(CLUSTER_COLORS)
+    # Group participants by cluster once; the point groups and angle extents share it
+    by_cluster = df_with_clusters.groupby('Cluster')
+    cluster_groups = dict(iter(by_cluster[['PC1', 'PC2']]))
     
-    # Calculate and draw boundary lines between clusters
-    cluster_labels = sorted(df_with_clusters['Cluster'].unique(), 
-                           key=lambda x: df_with_clusters[df_with_clusters['Cluster'] == x]['Angle'].min())
+    # Calculate and draw boundary lines between clusters, using the angular
+    # extent of each cluster ordered by its first angle
+    angle_range = by_cluster['Angle'].agg(['min', 'max']).sort_values('min')
     
-    boundary_angles = []
-    for i in range(len(cluster_labels)):
-        current_cluster = cluster_labels[i]
-        next_cluster = cluster_labels[(i + 1) % len(cluster_labels)]
-        
-        max_angle_current = df_with_clusters[df_with_clusters['Cluster'] == current_cluster]['Angle'].max()
-        min_angle_next = df_with_clusters[df_with_clusters['Cluster'] == next_cluster]['Angle'].min()
-        
-        # Handle wrap-around at 360 degrees
-        if min_angle_next < max_angle_current:
-            min_angle_next += 360
-            
-        boundary_angle = (max_angle_current + min_angle_next) / 2 % 360
-        boundary_angles.append(-boundary_angle + 30)
-    
-    # Draw boundary lines
-    boundary_angles = sorted(boundary_angles)
-    for boundary in boundary_angles:
-        rad = np.radians(boundary)
-        ax.plot(
-            [central_point[0], central_point[0] + 5 * np.cos(rad)],
-            [central_point[1], central_point[1] + 5 * np.sin(rad)],
-            color='black', linestyle='--', linewidth=1, alpha=0.7
-        )
-    
-    # Fill cluster areas with transparent colors
-    for cluster_label, color in CLUSTER_COLORS.items():
-        cluster_points = df_with_clusters[df_with_clusters['Cluster'] == cluster_label][['PC1', 'PC2']].values
+    # Each boundary is the circular mean of a cluster's last angle and the next
+    # cluster's first angle, which handles the wrap-around at 360 degrees
+    max_angles = np.radians(angle_range['max'].to_numpy())
+    next_min_angles = np.radians(np.roll(angle_range['min'].to_numpy(), -1))
+    boundary_rad = np.arctan2(np.sin(max_angles) + np.sin(next_min_angles),
+                              np.cos(max_angles) + np.cos(next_min_angles))
+    boundary_angles = (-(np.degrees(boundary_rad) - angle_offset) + 30) % 360
+    
+    # Draw boundary lines as one collection of rays from the central point
+    boundary_rad = np.radians(boundary_angles)
+    ray_starts = np.broadcast_to(central_point, (len(boundary_rad), 2))
+    ray_ends = ray_starts + 5 * np.column_stack([np.cos(boundary_rad), np.sin(boundary_rad)])
+    ax.add_collection(LineCollection(np.stack([ray_starts, ray_ends], axis=1),
+                                     colors='black', linestyles='--', linewidths=1, alpha=0.7))
+    
+    # Fill cluster areas with transparent colors, keeping each hull for later queries
+    hulls = {}
+    for cluster_label, group in cluster_groups.items():
+        color = CLUSTER_COLORS[cluster_label]
+        cluster_points = group.to_numpy()
         if len(cluster_points) > 2:
-            hull = ConvexHull(cluster_points)
-            for simplex in hull.simplices:
-                plt.fill(cluster_points[simplex, 0], cluster_points[simplex, 1], color=color, alpha=0.2)
+            hull = hulls[cluster_label] = ConvexHull(cluster_points, qhull_options='Qt')
+            ax.add_patch(Polygon(cluster_points[hull.vertices], closed=True, facecolor=color, alpha=0.2,
+                                 edgecolor='none'))
     
-    # Plot participants
-    ax.scatter(df_with_clusters['PC1'], df_with_clusters['PC2'], 
-               c=df_with_clusters['Color'], s=100)
+    # Plot participants, colored through integer cluster codes
+    palette_labels = list(CLUSTER_COLORS)
+    cluster_codes = df_with_clusters['Cluster'].map({label: i for i, label in enumerate(palette_labels)})
+    ax.scatter(df_with_clusters['PC1'], df_with_clusters['PC2'], c=cluster_codes.to_numpy(np.int8),
+               cmap=ListedColormap(list(CLUSTER_COLORS.values())),
+               vmin=-0.5, vmax=len(palette_labels) - 0.5, s=100)
     
     # Plot central point
     ax.scatter(*central_point, color='red', s=200, label='Center Point')
@@ -233,6 +281,8 @@ def visualize_clusters(df_with_clusters, central_point):
     print(f"Visualization saved as {OUTPUT_FILENAME}")
     
     plt.show()
+    
+    return hulls
 
 def main():
     """
@@ -248,22 +298,19 @@ def main():
     central_point = np.array([pca_df['PC1'].mean(), pca_df['PC2'].mean()])
     
     # Find optimal clustering
-    optimal_grouping, angle_offset = find_optimal_clustering(pca_df, NUM_CLUSTERS)
+    optimal_grouping, angle_offset = find_optimal_clustering(pca_df, NUM_CLUSTERS, ALIGN_TO_GAPS)
     
-    if optimal_grouping is not None:
-        # Visualize the results
-        visualize_clusters(optimal_grouping, central_point)
-        
-        # Save cluster assignments
-        output_file = 'radial_clustering_assignments.csv'
-        optimal_grouping[['pid', 'Cluster']].to_csv(output_file, index=False)
-        print(f"Cluster assignments saved to {output_file}")
-        
-        # For debug: Verify cluster sizes
-        print("\nCluster sizes:")
-        print(optimal_grouping.groupby('Cluster').size())
-    else:
-        print("Error: Could not find suitable clustering arrangement")
+    # Visualize the results
+    visualize_clusters(optimal_grouping, central_point, angle_offset)
+    
+    # Save cluster assignments
+    output_file = 'radial_clustering_assignments.csv'
+    optimal_grouping[['pid', 'Cluster']].to_csv(output_file, index=False)
+    print(f"Cluster assignments saved to {output_file}")
+    
+    # For debug: Verify cluster sizes
+    print("\nCluster sizes:")
+    print(optimal_grouping.groupby('Cluster').size())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file